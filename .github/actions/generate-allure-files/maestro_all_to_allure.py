@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 """
 Create Allure 2 results (with proper nested steps) from Maestro logs.
-No external dependencies (urllib only).
+No external dependencies (stdlib only). If google-re2 is installed
+(pip install google-re2) it is used for the per-line log scan, and if
+orjson is installed (pip install orjson) it is used for all JSON work.
 
 Two modes:
 1) Single log file (local path or URL):
@@ -20,49 +22,191 @@ Two modes:
      --out-dir ./allure-results \
      --suite "Wikipedia / Android"
 
+Add --no-steps to either mode to record only pass/fail and duration per
+test (a single cheap pass over each log, no step tree).
+
 Then build the report:
   allure generate ./allure-results -o ./allure-report --clean
 """
 
 import argparse
+import atexit
 import base64
+import calendar
+import contextlib
+import functools
+import gzip
+import http.client
 import json
 import os
 import re
+import shutil
 import sys
+import threading
+import time
 import uuid
+from array import array
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Any
-from urllib import request, error as urlerror
+from typing import Iterable, Iterator, List, Tuple, Optional, Dict, Any
+from urllib import error as urlerror
+from urllib.parse import unquote, urljoin, urlsplit, urlunsplit
+from urllib.request import getproxies, proxy_bypass
+
+try:  # optional: linear-time DFA matching, no backtracking on long log lines
+    import re2 as _line_re
+except ImportError:
+    _line_re = re
+
+try:  # optional: C JSON encoder that emits compact UTF-8 bytes directly
+    import orjson
+except ImportError:
+    orjson = None
 
 # -------------------------------------------------------------------
 # HTTP helpers (stdlib only)
 # -------------------------------------------------------------------
 
-def _http_get(url: str, *, auth: Optional[tuple] = None, timeout: int = 60, expect_json: bool = False) -> str:
-    headers = {"User-Agent": "maestro-allure/1.1"}
-    if auth:
-        user, key = auth
-        token = base64.b64encode(f"{user}:{key}".encode("utf-8")).decode("ascii")
-        headers["Authorization"] = f"Basic {token}"
+class HttpSession:
+    """
+    Minimal keep-alive GET client. One persistent connection per host is reused
+    across calls, so BrowserStack's TLS handshake is paid once instead of once per
+    request. Sends Basic Auth when provided, asks for gzip (see is_gzipped()),
+    follows redirects and retries 429/5xx responses and dropped connections with
+    exponential backoff. Honours HTTP_PROXY/HTTPS_PROXY/NO_PROXY the way urllib
+    does: https is tunnelled through the proxy with CONNECT, plain http is sent
+    to it as an absolute-URL request.
+    """
 
-    req = request.Request(url, headers=headers, method="GET")
-    try:
-        with request.urlopen(req, timeout=timeout) as resp:
-            ct = resp.headers.get("content-type", "")
-            data = resp.read()
-            text = data.decode("utf-8", errors="replace")
-            if expect_json and "application/json" not in ct:
-                raise RuntimeError(f"Expected JSON from {url}, got content-type={ct!r}")
-            return text
-    except urlerror.HTTPError as e:
-        if e.code == 401:
-            who = (auth[0] if auth and auth[0] else os.getenv("BROWSERSTACK_USERNAME") or "<missing>")
-            print(f"ERROR 401 from {url}. Username used: {who}", file=sys.stderr)
-        raise
-    except urlerror.URLError as e:
-        raise RuntimeError(f"Failed to GET {url}: {e}") from e
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+    MAX_REDIRECTS = 5
+
+    def __init__(self, auth: Optional[tuple] = None, *, timeout: int = 60, retries: int = 3, backoff: float = 0.3):
+        self.auth = auth
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = {"User-Agent": "maestro-allure/1.1", "Accept-Encoding": "gzip"}
+        if auth:
+            user, key = auth
+            token = base64.b64encode(f"{user}:{key}".encode("utf-8")).decode("ascii")
+            self.headers["Authorization"] = f"Basic {token}"
+        self._proxies = getproxies()
+        self._routes: Dict[Tuple[str, str], Optional[Tuple[str, Dict[str, str]]]] = {}
+        # http.client connections are not thread-safe: each thread gets its own pool
+        self._local = threading.local()
+        self._all_conns: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _proxy(self, scheme: str, netloc: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """(proxy host[:port], headers for the proxy) to reach `netloc` through, or None to go direct."""
+        key = (scheme, netloc)
+        if key not in self._routes:
+            proxy = self._proxies.get(scheme)
+            route = None
+            if proxy and not proxy_bypass(netloc):
+                p = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+                headers = {}
+                if p.username:
+                    cred = f"{unquote(p.username)}:{unquote(p.password or '')}"
+                    headers["Proxy-Authorization"] = "Basic " + base64.b64encode(cred.encode("utf-8")).decode("ascii")
+                route = (p.netloc.rpartition("@")[2], headers)
+            self._routes[key] = route
+        return self._routes[key]
+
+    def _conn(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            proxy = self._proxy(scheme, netloc)
+            if proxy is None:
+                conn = cls(netloc, timeout=self.timeout)
+            else:
+                proxy_netloc, proxy_headers = proxy
+                conn = cls(proxy_netloc, timeout=self.timeout)
+                if scheme == "https":
+                    conn.set_tunnel(netloc, headers=proxy_headers)
+            conns[(scheme, netloc)] = conn
+            with self._lock:
+                self._all_conns.append(conn)
+        return conn
+
+    def _send(self, url: str) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        parts = urlsplit(url)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = self.headers
+        proxy = self._proxy(parts.scheme, parts.netloc)
+        if proxy is not None and parts.scheme == "http":
+            # A plain-http proxy takes the absolute URL instead of a CONNECT tunnel
+            target = urlunsplit(parts._replace(fragment=""))
+            headers = {**headers, **proxy[1]}
+        conn = self._conn(parts.scheme, parts.netloc)
+        for attempt in range(self.retries + 1):
+            try:
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()  # reconnects on the next request
+                if attempt == self.retries:
+                    raise RuntimeError(f"Failed to GET {url}: {e}") from e
+            else:
+                if resp.status not in self.RETRY_STATUSES or attempt == self.retries:
+                    return conn, resp
+                resp.read()  # drain so the connection can be reused
+            time.sleep(self.backoff * (2 ** attempt))
+        raise AssertionError("unreachable")
+
+    @contextlib.contextmanager
+    def get(self, url: str) -> Iterator[http.client.HTTPResponse]:
+        """GET `url` and yield the open response. Raises HTTPError for 4xx/5xx."""
+        for _ in range(self.MAX_REDIRECTS + 1):
+            conn, resp = self._send(url)
+            location = resp.getheader("Location")
+            if resp.status not in self.REDIRECT_STATUSES or not location:
+                break
+            resp.read()
+            url = urljoin(url, location)
+        else:
+            raise RuntimeError(f"Too many redirects while fetching {url}")
+
+        try:
+            if resp.status >= 400:
+                if resp.status == 401:
+                    auth = self.auth
+                    who = (auth[0] if auth and auth[0] else os.getenv("BROWSERSTACK_USERNAME") or "<missing>")
+                    print(f"ERROR 401 from {url}. Username used: {who}", file=sys.stderr)
+                raise urlerror.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            yield resp
+        finally:
+            if not resp.isclosed():
+                conn.close()  # body was not fully read; don't reuse the socket
+            resp.close()
+
+    @staticmethod
+    def is_gzipped(resp: http.client.HTTPResponse) -> bool:
+        """Whether the body of `resp` must be gunzipped before use."""
+        return resp.getheader("Content-Encoding", "").strip().lower() == "gzip"
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all_conns:
+                conn.close()
+
+
+def _http_get(url: str, *, session: HttpSession, expect_json: bool = False) -> bytes:
+    with session.get(url) as resp:
+        ct = resp.headers.get("content-type", "")
+        data = resp.read()
+        if session.is_gzipped(resp):
+            data = gzip.decompress(data)
+        if expect_json and "application/json" not in ct:
+            raise RuntimeError(f"Expected JSON from {url}, got content-type={ct!r}")
+        return data
 
 
 # -------------------------------------------------------------------
@@ -72,119 +216,285 @@ def _http_get(url: str, *, auth: Optional[tuple] = None, timeout: int = 60, expe
 # Accept both BrowserStack and local loggers:
 #   maestro.cli.runner.TestSuiteInteractor.invoke: <name> RUNNING|COMPLETED|FAILED
 #   maestro.cli.runner.MaestroCommandRunner.runCommands$lambda$0: <name> RUNNING|COMPLETED|FAILED
-LINE_RE = re.compile(
-    r"""^(?P<time>\d{2}:\d{2}:\d{2}\.\d{3})\s+\[\s*\w+\]\s+(?:[\w$.]+\.)?(?:TestSuiteInteractor\.invoke|MaestroCommandRunner\.runCommands\$lambda\$\d+):\s+(?P<name>.+?)\s+(?P<state>RUNNING|COMPLETED|FAILED)\s*$"""
-)
-
-TIME_RE = re.compile(r"^(?P<h>\d{2}):(?P<m>\d{2}):(?P<s>\d{2})\.(?P<ms>\d{3})")
-
-def parse_hms_ms(tstr: str) -> Optional[int]:
-    m = TIME_RE.match(tstr)
-    if not m:
-        return None
-    h = int(m.group("h"))
-    m_ = int(m.group("m"))
-    s = int(m.group("s"))
-    ms = int(m.group("ms"))
-    return ((h * 3600 + m_ * 60 + s) * 1000) + ms
+# One pattern per logger, picked by a substring test, so neither carries an
+# alternation. The patterns only cover the line up to the logger's ':'; the
+# "<name> <state>" tail is split off from the right, which is linear in the
+# line length where a lazy (.+?) capture backtracks. The HH:MM:SS.mmm fields
+# are captured directly so one match per line yields the timestamp too.
+_LINE_HEAD = r"^(?P<h>\d{2}):(?P<m>\d{2}):(?P<s>\d{2})\.(?P<ms>\d{3})\s+\[\s*\w+\]\s+(?:[\w$.]+\.)?"
+SUITE_LINE_RE = _line_re.compile(_LINE_HEAD + r"TestSuiteInteractor\.invoke:")
+RUNNER_LINE_RE = _line_re.compile(_LINE_HEAD + r"MaestroCommandRunner\.runCommands\$lambda\$\d+:")
+
+STATE_SUFFIXES = ("RUNNING", "COMPLETED", "FAILED")
+# Literals that select the pattern: every line either regex accepts contains one
+EVENT_MARKERS = ("Interactor.invoke:", "runCommands$lambda$")
+
+
+def iter_step_events(lines: Iterable[str]) -> Iterator[Tuple[int, str, str]]:
+    """Yield (ts_ms, name, state) for every Maestro step event line in `lines`."""
+    suite_match, runner_match = SUITE_LINE_RE.match, RUNNER_LINE_RE.match
+    suite_marker, runner_marker = EVENT_MARKERS
+    intern = sys.intern
+    for raw in lines:
+        # Cheap C-level checks (logger literal, then trailing state token) so most
+        # lines never reach a regex
+        is_suite = suite_marker in raw
+        if not is_suite and runner_marker not in raw:
+            continue
+        line = raw.rstrip()
+        if not line.endswith(STATE_SUFFIXES):
+            continue
+        m = suite_match(line) if is_suite else None
+        if m is None and runner_marker in line:
+            m = runner_match(line)
+        if m is None:
+            continue
+        # Tail is "<ws><name><ws><state>": the state is the last whitespace-separated
+        # token, and the name is everything between the two whitespace runs
+        tail = line[m.end():]
+        if not tail[:1].isspace():
+            continue
+        parts = tail.rsplit(None, 1)
+        if len(parts) != 2 or parts[1] not in STATE_SUFFIXES:
+            continue
+        name, state = parts[0].lstrip(), parts[1]
+        if not name:
+            continue
+        # The split already trims the name; collapse inner whitespace only when
+        # there is some to collapse (any whitespace but " " is non-printable)
+        if "  " in name or not name.isprintable():
+            name = " ".join(name.split())
+        h, m_, s, ms = m.groups()
+        # Step names repeat heavily ("Tap on ...", subflow names): share one str per name
+        yield (int(h) * 3600 + int(m_) * 60 + int(s)) * 1000 + int(ms), intern(name), state
 
 
-def fetch_text(source: str, *, auth: Optional[tuple] = None, timeout: int = 60) -> str:
-    """Read from URL or local path. Sends Basic Auth when provided."""
+def download_to(source: str, dest: Path, *, session: HttpSession) -> None:
+    """
+    Copy a log from a URL (fetched through `session`) or local path to `dest`
+    in 64 KiB chunks, without ever holding the whole body in memory. A gzipped
+    response is inflated on the fly, so `dest` always holds the plain log.
+    """
     if source.startswith(("http://", "https://")):
-        return _http_get(source, auth=auth, timeout=timeout, expect_json=False)
-    return Path(source).read_text(encoding="utf-8", errors="replace")
+        with session.get(source) as resp, dest.open("wb") as f:
+            body = gzip.GzipFile(fileobj=resp) if session.is_gzipped(resp) else resp
+            shutil.copyfileobj(body, f, 65536)
+    else:
+        shutil.copyfile(source, dest)
 
 # -------------------------------------------------------------------
 # Step tree builder (supports nesting / subflows indentation)
 # -------------------------------------------------------------------
 
-class StepNode:
-    def __init__(self, name: str, start: Optional[int] = None):
-        self.name = name
-        self.start = start  # relative ms from log
-        self.stop: Optional[int] = None  # relative ms from log
-        self.status: str = "passed"
-        self.stage: str = "finished"
-        self.children: List["StepNode"] = []
-
-    def to_allure(self, *, base_epoch_ms: int = 0, first_rel_ms: Optional[int] = None) -> dict:
-        def shift(v: Optional[int]) -> int:
-            if v is None:
-                return base_epoch_ms
-            if first_rel_ms is None:
-                return base_epoch_ms + v
-            return base_epoch_ms + max(0, v - first_rel_ms)
-
-        data = {
-            "name": self.name,
-            "status": self.status,
-            "stage": self.stage,
-            "start": shift(self.start),
-            "stop": shift(self.stop if self.stop is not None else self.start),
-        }
-        if self.children:
-            data["steps"] = [c.to_allure(base_epoch_ms=base_epoch_ms, first_rel_ms=first_rel_ms) for c in self.children]
-        return data
+STEP_STATUS = ("passed", "failed")  # indexed by StepTable.failed (or any bool)
 
 
-def build_step_tree(log_text: str) -> Tuple[List[StepNode], Optional[int], Optional[int]]:
-    roots: List[StepNode] = []
-    stack: List[StepNode] = []
+class StepTable:
+    """
+    The steps of one log stored column-wise, one row per step in the order the
+    steps started. `parent[i]` is the row of step i's enclosing step (-1 for a
+    top-level step); a parent row always precedes its children, so a single
+    forward pass over the rows rebuilds the nesting without recursion.
+    """
+
+    __slots__ = ("names", "start", "stop", "failed", "parent", "failed_count")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.start = array("q")  # relative ms from log
+        self.stop = array("q")  # relative ms from log
+        self.failed = bytearray()  # 0 = passed, 1 = failed
+        self.parent = array("i")
+        self.failed_count = 0  # kept in step with `failed` so status needs no scan
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, start: int, parent: int = -1) -> int:
+        """Append a step that starts (and, until closed, stops) at `start`; returns its row."""
+        self.names.append(name)
+        self.start.append(start)
+        self.stop.append(start)
+        self.failed.append(0)
+        self.parent.append(parent)
+        return len(self.names) - 1
+
+    def mark_failed(self, row: int) -> None:
+        if not self.failed[row]:
+            self.failed[row] = 1
+            self.failed_count += 1
+
+    def to_allure(self, *, base_epoch_ms: int, first_rel_ms: int) -> List[dict]:
+        """Allure step dicts for the top-level steps, with children nested under "steps"."""
+        top: List[dict] = []
+        rows: List[dict] = []
+        add_row = rows.append
+        # Log time v maps to base_epoch_ms + max(0, v - first_rel_ms)
+        offset = base_epoch_ms - first_rel_ms
+        # Every row is emitted as a leaf (one dict literal, no per-field lookups);
+        # a "steps" list is only attached to a row once a child actually refers to it.
+        for name, start, stop, failed, p in zip(self.names, self.start, self.stop, self.failed, self.parent):
+            data = {
+                "name": name,
+                "status": STEP_STATUS[failed],
+                "stage": "finished",
+                "start": offset + start if start > first_rel_ms else base_epoch_ms,
+                "stop": offset + stop if stop > first_rel_ms else base_epoch_ms,
+            }
+            if p < 0:
+                top.append(data)
+            else:
+                parent = rows[p]
+                if "steps" in parent:
+                    parent["steps"].append(data)
+                else:
+                    parent["steps"] = [data]
+            add_row(data)
+        return top
+
+
+def build_step_tree(lines: Iterable[str]) -> Tuple[StepTable, Optional[int], Optional[int]]:
+    steps = StepTable()
+    stop = steps.stop
+    stack: List[int] = []  # rows of the steps that are still running, innermost last
+    open_by_name: Dict[str, List[int]] = {}  # the same rows, grouped by step name
     first_ts: Optional[int] = None
     last_ts: Optional[int] = None
 
-    for raw in log_text.splitlines():
-        m = LINE_RE.match(raw)
-        if not m:
-            continue
-        ts = parse_hms_ms(m.group("time"))
-        name = re.sub(r"\s+", " ", m.group("name").strip())
-        state = m.group("state")
-        if first_ts is None and ts is not None:
+    for ts, name, state in iter_step_events(lines):
+        if first_ts is None:
             first_ts = ts
         if state == "RUNNING":
-            node = StepNode(name=name, start=ts)
-            (stack[-1].children if stack else roots).append(node)
-            stack.append(node)
+            row = steps.add(name, ts, stack[-1] if stack else -1)
+            stack.append(row)
+            open_rows = open_by_name.get(name)
+            if open_rows is None:
+                open_by_name[name] = [row]
+            else:
+                open_rows.append(row)
         elif state in ("COMPLETED", "FAILED"):
-            idx = None
-            for i in range(len(stack) - 1, -1, -1):
-                if stack[i].name == name and stack[i].stop is None:
-                    idx = i
-                    break
-            if idx is None:
-                node = StepNode(name=name, start=ts)
-                node.stop = ts
-                node.status = "passed" if state == "COMPLETED" else "failed"
-                roots.append(node)
-                if ts is not None:
-                    last_ts = ts if last_ts is None else max(last_ts, ts)
+            open_rows = open_by_name.get(name)
+            if not open_rows:
+                row = steps.add(name, ts)  # no matching RUNNING: record a top-level step
             else:
-                node = stack.pop(idx)
-                node.stop = ts if ts is not None else node.start
-                node.status = "passed" if state == "COMPLETED" else "failed"
-                if ts is not None:
-                    last_ts = ts if last_ts is None else max(last_ts, ts)
+                # Innermost open step with this name; almost always the top of the stack
+                row = open_rows.pop()
+                if stack[-1] == row:
+                    stack.pop()
+                else:
+                    stack.remove(row)
+                stop[row] = ts
+            if state == "FAILED":
+                steps.mark_failed(row)
+            last_ts = ts if last_ts is None else max(last_ts, ts)
+
+    # Steps still running at the end of the log never finished: mark them failed
+    for row in stack:
+        steps.mark_failed(row)
+        last_ts = stop[row] if last_ts is None else max(last_ts, stop[row])
+
+    return steps, first_ts, last_ts
+
+
+def scan_log_summary(lines: Iterable[str]) -> Tuple[bool, Optional[int], Optional[int]]:
+    """
+    --no-steps pass: same events as build_step_tree(), but only tracks
+    whether any step failed (or never finished) and the first/last timestamps.
+    Memory is bounded by the steps open at any one time.
+    Returns (failed, first_ts, last_ts).
+    """
+    open_starts: Dict[str, List[int]] = {}  # start times of open steps, per name
+    failed = False
+    first_ts: Optional[int] = None
+    last_ts: Optional[int] = None
+
+    for ts, name, state in iter_step_events(lines):
+        if first_ts is None:
+            first_ts = ts
+        if state == "RUNNING":
+            open_starts.setdefault(name, []).append(ts)
+        else:
+            starts = open_starts.get(name)
+            if starts:
+                starts.pop()
+            failed = failed or state == "FAILED"
+            last_ts = ts if last_ts is None else max(last_ts, ts)
 
-    while stack:
-        node = stack.pop()
-        node.stop = node.start
-        node.status = "failed"
-        if node.stop is not None:
-            last_ts = node.stop if last_ts is None else max(last_ts, node.stop)
+    for starts in open_starts.values():
+        if starts:
+            failed = True
+            last_ts = max(starts) if last_ts is None else max(last_ts, *starts)
 
-    return roots, first_ts, last_ts
+    return failed, first_ts, last_ts
 
 # -------------------------------------------------------------------
 # Allure results writer (epochized)
 # -------------------------------------------------------------------
 
+# Labels shared by every result; only serialised, never mutated
+STATIC_LABELS = (
+    {"name": "framework", "value": "maestro"},
+    {"name": "language", "value": "python"},
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _suite_label(suite_name: str) -> dict:
+    return {"name": "suite", "value": suite_name}
+
+
+class _IdPool:
+    """
+    Random UUID4 hex ids (no dashes) carved out of one os.urandom() read per
+    batch instead of one syscall per id. Thread-safe.
+    """
+
+    def __init__(self, batch: int = 256):
+        self._batch = batch
+        self._buf = b""
+        self._pos = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            if self._pos >= len(self._buf):
+                self._buf = os.urandom(16 * self._batch)
+                self._pos = 0
+            raw = self._buf[self._pos:self._pos + 16]
+            self._pos += 16
+        return uuid.UUID(bytes=raw, version=4).hex
+
+
+new_id = _IdPool()
+
+
+@functools.lru_cache(maxsize=256)
 def _parse_bs_time_to_epoch_ms(s: Optional[str]) -> Optional[int]:
-    """Parse BS timestamps like '2025-05-20 13:38:35 +0000' or '2025-04-08 07:17:34 UTC'."""
+    """
+    Parse BS timestamps like '2025-05-20 13:38:35 +0000' or '2025-04-08 07:17:34 UTC'.
+    Cached: sessions of one build mostly share a handful of distinct start times.
+    """
     if not s:
         return None
     s = s.strip()
+
+    # Fast path for the fixed-width shapes BrowserStack actually sends
+    if len(s) > 20 and s[4] == "-" and s[7] == "-" and s[10] == " " and s[13] == ":" and s[16] == ":" and s[19] == " ":
+        tz = s[20:]
+        if tz in ("UTC", "GMT", "Z"):
+            offset_s = 0
+        elif len(tz) in (5, 6) and tz[0] in "+-" and tz[1:3].isdigit() and tz[-2:].isdigit():
+            offset_s = (int(tz[1:3]) * 3600 + int(tz[-2:]) * 60) * (1 if tz[0] == "+" else -1)
+        else:
+            offset_s = None
+        if offset_s is not None:
+            try:
+                fields = (int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]), int(s[17:19]))
+            except ValueError:
+                pass
+            else:
+                return (calendar.timegm(fields) - offset_s) * 1000
+
     for fmt in ("%Y-%m-%d %H:%M:%S %z", "%Y-%m-%d %H:%M:%S %Z"):
         try:
             dt = datetime.strptime(s, fmt)
@@ -198,7 +508,8 @@ def _parse_bs_time_to_epoch_ms(s: Optional[str]) -> Optional[int]:
 
 def result_from_tree(
     *,
-    roots: List[StepNode],
+    steps: Optional[StepTable],
+    failed: bool,
     first_ms: Optional[int],
     last_ms: Optional[int],
     suite_name: str,
@@ -213,18 +524,11 @@ def result_from_tree(
     """
     Build the Allure result JSON. Caller is responsible for writing the attachment
     file to disk and passing its *unique* filename as `attachment_source`.
+    `steps` is None when step details were skipped (--no-steps).
     """
-    test_uuid = str(uuid.uuid4())
-
-    def any_failed(nodes: List[StepNode]) -> bool:
-        for n in nodes:
-            if n.status != "passed":
-                return True
-            if n.children and any_failed(n.children):
-                return True
-        return False
+    test_uuid = new_id()
 
-    status = "failed" if any_failed(roots) else "passed"
+    status = STEP_STATUS[failed]
 
     if bs_test_start_epoch_ms is not None and first_ms is not None:
         base_epoch_ms = bs_test_start_epoch_ms - first_ms
@@ -236,13 +540,7 @@ def result_from_tree(
     start_ms = (base_epoch_ms + first_ms) if first_ms is not None else int(datetime.now(tz=timezone.utc).timestamp() * 1000)
     stop_ms = (base_epoch_ms + last_ms) if (last_ms is not None and first_ms is not None) else start_ms
 
-    labels = [
-        {"name": "suite", "value": suite_name},
-        {"name": "framework", "value": "maestro"},
-        {"name": "language", "value": "python"},
-    ]
-    if extra_labels:
-        labels.extend(extra_labels)
+    labels = [_suite_label(suite_name), *STATIC_LABELS, *(extra_labels or ())]
 
     params = parameters or []
 
@@ -260,7 +558,7 @@ def result_from_tree(
         "stage": "finished",
         "start": start_ms,
         "stop": stop_ms,
-        "steps": [n.to_allure(base_epoch_ms=base_epoch_ms, first_rel_ms=first_ms) for n in roots],
+        "steps": steps.to_allure(base_epoch_ms=base_epoch_ms, first_rel_ms=first_ms) if steps and first_ms is not None else [],
         "attachments": [
             # Display name stays constant; *source* is unique per test
             {"name": "_raw_maestro_log", "type": "text/plain", "source": attachment_source}
@@ -272,67 +570,139 @@ def result_from_tree(
         result["links"] = links
     return result
 
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
+def write_bytes(path: Path, data: bytes) -> None:
+    """One-shot file write on a raw fd, skipping the buffered file object."""
+    fd = os.open(path, _WRITE_FLAGS, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def write_json(path: Path, obj: Any) -> None:
+    """
+    Write `obj` as compact UTF-8 JSON. orjson produces the final bytes in one
+    go; the stdlib fallback streams encoder chunks straight into the file rather
+    than materialising the whole document as a str and then again as bytes.
+    """
+    if orjson is not None:
+        write_bytes(path, orjson.dumps(obj))
+        return
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+
 # -------------------------------------------------------------------
 # BrowserStack Maestro API helpers (v2, api-cloud host) — stdlib only
 # -------------------------------------------------------------------
 
 BS_API_BASE = "https://api-cloud.browserstack.com/app-automate/maestro/v2"
 
-def bs_get_json(url_or_path: str, *, auth: tuple) -> dict:
+def bs_get_json(url_or_path: str, *, session: HttpSession) -> dict:
     url = url_or_path if url_or_path.startswith("http") else f"{BS_API_BASE}/{url_or_path.lstrip('/')}"
-    text = _http_get(url, auth=auth, expect_json=True)
-    return json.loads(text)
+    data = _http_get(url, session=session, expect_json=True)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8", errors="replace"))
+
+def _session_testcases(sess: dict) -> Iterator[dict]:
+    """Flatten the `testcases.data[].testcases[]` path of a session payload."""
+    for group in (sess.get("testcases") or {}).get("data") or ():
+        yield from group.get("testcases") or ()
+
 
-def iter_tests_for_build(build_id: str, *, auth: tuple):
+def iter_tests_for_build(build_id: str, *, session: HttpSession, executor: Optional[Executor] = None):
     """
     Yield test dictionaries with at least:
       id, name, device, os, os_version, session_id, maestro_log_url, bs_test_start_epoch_ms
-    """
-    build = bs_get_json(f"builds/{build_id}", auth=auth)
-    devices = build.get("devices", []) or []
 
-    for d in devices:
+    The per-session detail payloads are fetched concurrently on `executor`
+    (serially without one); tests are still yielded in build order.
+    """
+    build = bs_get_json(f"builds/{build_id}", session=session)
+    sessions = []  # (device_name, os_name, os_version, sess_id) in build order
+    for d in build.get("devices") or ():
         device_name = d.get("device") or "unknown"
         os_name = (d.get("os") or "").lower() or "android"
         os_version = d.get("os_version") or "unknown"
-        sessions = d.get("sessions", []) or []
 
-        for s in sessions:
+        for s in d.get("sessions") or ():
             sess_id = s.get("id")
-            if not sess_id:
+            if sess_id:
+                sessions.append((device_name, os_name, os_version, sess_id))
+
+    def fetch(sess_id: str) -> dict:
+        return bs_get_json(f"builds/{build_id}/sessions/{sess_id}", session=session)
+
+    fetch_all = executor.map if executor is not None else map
+    for (device_name, os_name, os_version, sess_id), sess in zip(sessions, fetch_all(fetch, [entry[3] for entry in sessions])):
+        bs_session_start_ms = _parse_bs_time_to_epoch_ms(sess.get("start_time"))
+
+        for case in _session_testcases(sess):
+            test_id = case.get("id")
+            test_name = case.get("name") or f"Test {test_id or 'unknown'}"
+
+            log_url = case.get("maestro_log") or case.get("maestrologs")
+            if not log_url:
+                print(f"WARNING: No Maestro text log URL for test {test_id} in session {sess_id} on {device_name}. Skipping.", file=sys.stderr)
                 continue
 
-            sess = bs_get_json(f"builds/{build_id}/sessions/{sess_id}", auth=auth)
-            bs_session_start_ms = _parse_bs_time_to_epoch_ms(sess.get("start_time"))
-
-            troot = (sess.get("testcases") or {})
-            groups = troot.get("data") or []
-            for g in groups:
-                for case in g.get("testcases", []):
-                    test_id = case.get("id")
-                    test_name = case.get("name") or f"Test {test_id or 'unknown'}"
-
-                    log_url = case.get("maestro_log") or case.get("maestrologs")
-                    if not log_url:
-                        print(f"WARNING: No Maestro text log URL for test {test_id} in session {sess_id} on {device_name}. Skipping.", file=sys.stderr)
-                        continue
-
-                    yield {
-                        "id": test_id,
-                        "name": test_name,
-                        "device": device_name,
-                        "os": os_name,
-                        "os_version": os_version,
-                        "session_id": sess_id,
-                        "build_id": build_id,
-                        "maestro_log_url": log_url,
-                        "bs_test_start_epoch_ms": bs_session_start_ms,
-                    }
+            yield {
+                "id": test_id,
+                "name": test_name,
+                "device": device_name,
+                "os": os_name,
+                "os_version": os_version,
+                "session_id": sess_id,
+                "build_id": build_id,
+                "maestro_log_url": log_url,
+                "bs_test_start_epoch_ms": bs_session_start_ms,
+            }
 
 # -------------------------------------------------------------------
 # CLI
 # -------------------------------------------------------------------
 
+DEFAULT_WORKERS = 16
+
+
+def _positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return n
+
+
+def fetch_and_parse_log(
+    source: str, *, session: HttpSession, out_dir: Path, with_steps: bool = True
+) -> Tuple[str, Optional[StepTable], bool, Optional[int], Optional[int]]:
+    """
+    Download one Maestro log straight into a UNIQUE raw-log attachment under
+    `out_dir`, then parse that file line by line. With `with_steps=False` only
+    the pass/fail summary is computed and `steps` is None.
+    Returns (attachment_source, steps, failed, first_ms, last_ms).
+    Safe to call from worker threads.
+    """
+    attachment_source = f"{new_id()}-raw_maestro_log.txt"
+    raw_log = out_dir / attachment_source
+    download_to(source, raw_log, session=session)
+    if not with_steps:
+        with raw_log.open("r", encoding="utf-8", errors="replace", newline="") as f:
+            failed, first_ms, last_ms = scan_log_summary(f)
+        return attachment_source, None, failed, first_ms, last_ms
+    with raw_log.open("r", encoding="utf-8", errors="replace", newline="") as f:
+        steps, first_ms, last_ms = build_step_tree(f)
+    return attachment_source, steps, steps.failed_count > 0, first_ms, last_ms
+
+
 def main():
     ap = argparse.ArgumentParser(description="Convert Maestro raw log(s) to Allure results (no external deps).")
     mode = ap.add_mutually_exclusive_group(required=True)
@@ -342,6 +712,14 @@ def main():
     ap.add_argument("--out-dir", default="./allure-results", help="Directory to write Allure results.")
     ap.add_argument("--suite", default="Maestro / Android", help="Allure suite name.")
     ap.add_argument("--test", default="Maestro Scenario", help="Allure test name (single-log mode only).")
+    ap.add_argument(
+        "--workers",
+        type=_positive_int,
+        # A str default goes through `type` too, so a bad $MAESTRO_WORKERS is a usage error
+        default=os.getenv("MAESTRO_WORKERS", str(DEFAULT_WORKERS)),
+        help=f"Logs downloaded/parsed in parallel in --build-id mode (falls back to $MAESTRO_WORKERS, default {DEFAULT_WORKERS}).",
+    )
+    ap.add_argument("--no-steps", action="store_true", help="Only record pass/fail and duration per test; skip the step tree.")
 
     ap.add_argument("--username", help="BrowserStack username (falls back to $BROWSERSTACK_USERNAME).")
     ap.add_argument("--access-key", help="BrowserStack access key (falls back to $BROWSERSTACK_ACCESS_KEY).")
@@ -354,21 +732,21 @@ def main():
     username = args.username or os.getenv("BROWSERSTACK_USERNAME", "")
     access_key = args.access_key or os.getenv("BROWSERSTACK_ACCESS_KEY", "")
     auth = (username, access_key) if (username and access_key) else None
+    session = HttpSession(auth)
+    # Also runs when a fetch raises or we sys.exit(), so no socket is left open.
+    atexit.register(session.close)
 
     total_tests = 0
 
     if args.url:
         # Single-log mode
-        log_text = fetch_text(args.url, auth=auth)
-
-        roots, first_ms, last_ms = build_step_tree(log_text)
-
-        # Write a UNIQUE attachment file and reference it by that name
-        attachment_source = f"{uuid.uuid4()}-raw_maestro_log.txt"
-        (out_dir / attachment_source).write_text(log_text, encoding="utf-8")
+        attachment_source, steps, failed, first_ms, last_ms = fetch_and_parse_log(
+            args.url, session=session, out_dir=out_dir, with_steps=not args.no_steps
+        )
 
         result = result_from_tree(
-            roots=roots,
+            steps=steps,
+            failed=failed,
             first_ms=first_ms,
             last_ms=last_ms,
             suite_name=args.suite,
@@ -377,35 +755,26 @@ def main():
             parameters=[],
             history_discriminator=None,
         )
-        (out_dir / f"{uuid.uuid4()}-result.json").write_text(
-            json.dumps(result, ensure_ascii=False, separators=(",", ":")), encoding="utf-8"
-        )
+        write_json(out_dir / f"{result['uuid']}-result.json", result)
 
         container = {
-            "uuid": str(uuid.uuid4()),
+            "uuid": new_id(),
             "name": args.suite,
             "children": [result["uuid"]],
             "befores": [],
             "afters": [],
             "links": [],
         }
-        (out_dir / f"{uuid.uuid4()}-container.json").write_text(
-            json.dumps(container, ensure_ascii=False, separators=(",", ":")), encoding="utf-8"
-        )
+        write_json(out_dir / f"{container['uuid']}-container.json", container)
 
-        def flatten(nodes: List[StepNode]) -> List[StepNode]:
-            out = []
-            for n in nodes:
-                out.append(n)
-                out.extend(flatten(n.children))
-            return out
-
-        flat = flatten(roots)
-        passed_cnt = sum(1 for s in flat if s.status == "passed")
-        failed_cnt = sum(1 for s in flat if s.status != "passed")
         dur_s = ((last_ms or 0) - (first_ms or 0)) / 1000.0 if (first_ms is not None and last_ms is not None) else 0.0
         print(f"Wrote Allure results to: {out_dir}")
-        print(f"Test: {args.test} | Steps: {len(flat)} (passed: {passed_cnt}, failed: {failed_cnt}) | Duration: {dur_s:.3f}s")
+        if steps is None:
+            print(f"Test: {args.test} | Status: {result['status']} | Duration: {dur_s:.3f}s")
+        else:
+            failed_cnt = steps.failed_count
+            passed_cnt = len(steps) - failed_cnt
+            print(f"Test: {args.test} | Steps: {len(steps)} (passed: {passed_cnt}, failed: {failed_cnt}) | Duration: {dur_s:.3f}s")
         total_tests = 1
 
     elif args.build_id:
@@ -414,66 +783,65 @@ def main():
             sys.exit(2)
 
         children = []
-        for t in iter_tests_for_build(args.build_id, auth=auth):
-            total_tests += 1
-            test_name = t["name"]
-
-            log_text = fetch_text(t["maestro_log_url"], auth=auth)
-
-            # Unique attachment per test
-            attachment_source = f"{uuid.uuid4()}-raw_maestro_log.txt"
-            (out_dir / attachment_source).write_text(log_text, encoding="utf-8")
-
-            roots, first_ms, last_ms = build_step_tree(log_text)
-
-            labels = [
-                {"name": "host", "value": (t.get("device") or "unknown")},
-                {"name": "thread", "value": (t.get("os") or "unknown")},
-            ]
-
-            parameters = [
-                {"name": "device", "value": t.get("device") or "unknown"},
-                {"name": "os_version", "value": t.get("os_version") or "unknown"},
-                {"name": "os", "value": t.get("os") or "unknown"},
-            ]
-
-            build_url = f"https://app-automate.browserstack.com/dashboard/v2/builds/{t.get('build_id')}"
-            session_url = f"{build_url}/sessions/{t.get('session_id')}"
-            links = [
-                {"name": "Browserstack session", "url": session_url, "type": "BrowserStack"},
-            ]
-
-            hist_disc = f"{t.get('device')}|{t.get('os')}|{t.get('os_version')}|{t.get('session_id')}"
-
-            result = result_from_tree(
-                roots=roots,
-                first_ms=first_ms,
-                last_ms=last_ms,
-                suite_name=args.suite,
-                test_name=test_name,
-                attachment_source=attachment_source,
-                extra_labels=labels,
-                parameters=parameters,
-                links=links,
-                bs_test_start_epoch_ms=t.get("bs_test_start_epoch_ms"),
-                history_discriminator=hist_disc,
-            )
-            (out_dir / f"{uuid.uuid4()}-result.json").write_text(
-                json.dumps(result, ensure_ascii=False, separators=(",", ":")), encoding="utf-8"
-            )
-            children.append(result["uuid"])
+        # One pool serves the session-detail prefetch and then the log downloads,
+        # so each worker's keep-alive connections are reused across both phases.
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            tests = list(iter_tests_for_build(args.build_id, session=session, executor=pool))
+            total_tests = len(tests)
+
+            # Logs are downloaded and parsed concurrently; results are assembled and
+            # written here in the original test order.
+            def fetch(t: dict):
+                return fetch_and_parse_log(t["maestro_log_url"], session=session, out_dir=out_dir, with_steps=not args.no_steps)
+
+            for t, (attachment_source, steps, failed, first_ms, last_ms) in zip(tests, pool.map(fetch, tests)):
+                test_name = t["name"]
+
+                labels = [
+                    {"name": "host", "value": (t.get("device") or "unknown")},
+                    {"name": "thread", "value": (t.get("os") or "unknown")},
+                ]
+
+                parameters = [
+                    {"name": "device", "value": t.get("device") or "unknown"},
+                    {"name": "os_version", "value": t.get("os_version") or "unknown"},
+                    {"name": "os", "value": t.get("os") or "unknown"},
+                ]
+
+                build_url = f"https://app-automate.browserstack.com/dashboard/v2/builds/{t.get('build_id')}"
+                session_url = f"{build_url}/sessions/{t.get('session_id')}"
+                links = [
+                    {"name": "Browserstack session", "url": session_url, "type": "BrowserStack"},
+                ]
+
+                hist_disc = f"{t.get('device')}|{t.get('os')}|{t.get('os_version')}|{t.get('session_id')}"
+
+                result = result_from_tree(
+                    steps=steps,
+                    failed=failed,
+                    first_ms=first_ms,
+                    last_ms=last_ms,
+                    suite_name=args.suite,
+                    test_name=test_name,
+                    attachment_source=attachment_source,
+                    extra_labels=labels,
+                    parameters=parameters,
+                    links=links,
+                    bs_test_start_epoch_ms=t.get("bs_test_start_epoch_ms"),
+                    history_discriminator=hist_disc,
+                )
+                write_json(out_dir / f"{result['uuid']}-result.json", result)
+                children.append(result["uuid"])
 
         container = {
-            "uuid": str(uuid.uuid4()),
+            "uuid": new_id(),
             "name": args.suite,
             "children": children,
             "befores": [],
             "afters": [],
             "links": [],
         }
-        (out_dir / f"{uuid.uuid4()}-container.json").write_text(
-            json.dumps(container, ensure_ascii=False, separators=(",", ":")), encoding="utf-8"
-        )
+        write_json(out_dir / f"{container['uuid']}-container.json", container)
 
         print(f"Wrote Allure results to: {out_dir}")
         print(f"Converted {total_tests} BrowserStack test(s) from build {args.build_id}.")